@@ -1,4 +1,5 @@
-from ..storage.base import RateLimitStorage
+from ..storage.base import RateLimitStorage, ConsumeResult
+import asyncio
 
 class TokenBucket:
     def __init__(self, capacity, refill_rate, refill_time, storage: RateLimitStorage):
@@ -14,15 +15,42 @@ class TokenBucket:
         This method delegates to the storage backend's atomic_consume_token method,
         which handles all the complexity of refilling tokens and consuming them atomically.
         """
+        self._require_sync_storage("allow_request_async")
         return self.storage.atomic_consume_token(key, self.capacity, self.refill_rate, self.refill_time)
+
+    async def allow_request_async(self, key: str) -> bool:
+        """allow_request for async storages such as AsyncRedisStorage"""
+        return await self.storage.atomic_consume_token(key, self.capacity, self.refill_rate, self.refill_time)
+
+    def consume(self, key: str) -> ConsumeResult:
+        """
+        Like allow_request, but also report the tokens left and the seconds
+        until the next token, taken from the same storage call.
+
+        With an async storage this returns a coroutine to await.
+        """
+        return self.storage.atomic_consume_token_with_info(key, self.capacity, self.refill_rate, self.refill_time)
     
     def get_bucket_info(self, key: str) -> dict:
         """
         Get information about a bucket's current state.
         Useful for debugging and monitoring.
         """
-        state = self.storage.get_bucket_state(key)
+        self._require_sync_storage("get_bucket_info_async")
+        return self._bucket_info(self.storage.get_bucket_state(key))
+
+    async def get_bucket_info_async(self, key: str) -> dict:
+        """get_bucket_info for async storages such as AsyncRedisStorage"""
+        return self._bucket_info(await self.storage.get_bucket_state(key))
+
+    def _require_sync_storage(self, async_method: str) -> None:
+        # A coroutine is truthy, so returning one unawaited would allow every request
+        if asyncio.iscoroutinefunction(self.storage.atomic_consume_token_with_info):
+            raise TypeError(
+                f"{type(self.storage).__name__} is async, use {async_method} instead."
+            )
 
+    def _bucket_info(self, state) -> dict:
         if state is None:
             return {
                 'tokens': self.capacity,
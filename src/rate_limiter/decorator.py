@@ -1,9 +1,11 @@
 from functools import wraps
-from typing import Optional, Callable, Union
+from typing import Optional, Callable, Union, Tuple
 from fastapi import Request, HTTPException
 from .algorithms.token_bucket import TokenBucket, parse_rate_limit_string
 from .storage.factory import StorageFactory
 import asyncio
+import inspect
+import math
 
 
 def rate_limit(
@@ -22,7 +24,8 @@ def rate_limit(
         refill_rate: Tokens to add per refill period (if using numeric format)
         refill_time: Seconds between refills (if using numeric format)
         key_func: Function to extract user identifier from request
-        storage_type: "memory" or "redis"
+        storage_type: "memory", "redis", "fixed_window", "sliding_counter", "redis-async"
+            or "reserving"
         storage_config: Additional configuration for storage backend
     
     Examples:
@@ -31,6 +34,18 @@ def rate_limit(
         
         # Redis storage
         @rate_limit("10/minute", storage_type="redis")
+
+        # Redis fixed window counter (one INCR per request)
+        @rate_limit("10/minute", storage_type="fixed_window")
+
+        # Redis sliding window estimated from two fixed window counters
+        @rate_limit("10/minute", storage_type="sliding_counter")
+
+        # Non-blocking Redis storage, async endpoints only
+        @rate_limit("10/minute", storage_type="redis-async")
+
+        # Redis token bucket reserved in chunks, fewer Redis calls per request
+        @rate_limit("100/second", storage_type="reserving", storage_config={"chunk_size": 10})
         
         # Redis with custom config
         @rate_limit(
@@ -49,11 +64,17 @@ def rate_limit(
         if refill_rate is None or refill_time is None:
             raise ValueError("Must specify refill_rate and refill_time with numeric format")
     
+    if refill_rate <= 0 or refill_time <= 0:
+        raise ValueError("refill_rate and refill_time must be positive")
+    
     storage_config = storage_config or {}
     storage = StorageFactory.create_storage(storage_type, **storage_config)
 
     bucket = TokenBucket(capacity, refill_rate, refill_time, storage)
 
+    # Async storages return coroutines, which only an async endpoint can await
+    storage_is_async = asyncio.iscoroutinefunction(storage.atomic_consume_token_with_info)
+
     def default_key_func(request) -> str:
         if hasattr(request, 'client') and hasattr(request.client, 'host'):
             return request.client.host
@@ -64,122 +85,116 @@ def rate_limit(
         
     get_key = key_func or default_key_func
 
+    limit_value = int(capacity)
+    limit_header = str(limit_value)
+
+    def reject(result):
+        # Remaining tokens, retry and reset times come from the same storage call
+        retry_after = math.ceil(result.retry_after)
+
+        # Detailed error response
+        headers = {
+            "X-RateLimit-Limit": limit_header,
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(math.ceil(result.reset_after)),
+            "Retry-After": str(retry_after)
+        }
+        if result.short_circuited:
+            headers["X-RateLimit-Mode"] = "short-circuit"
+
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": "Rate limit exceeded",
+                "limit": limit_value,
+                "remaining": result.remaining,
+                "reset_in_seconds": retry_after,
+                "storage_type": storage_type
+            },
+            headers=headers
+        )
+
     def decorator(func):
         is_async = asyncio.iscoroutinefunction(func)
-        
-        if is_async:
+        if storage_is_async and not is_async:
+            raise TypeError(
+                f"Storage type '{storage_type}' can only rate limit async endpoints, "
+                f"but '{func.__name__}' is not async."
+            )
+
+        request_name, request_position = find_request_parameter(func)
+
+        # Everything fixed per endpoint is bound here, so each wrapper below
+        # runs straight through with no branches on the configuration
+        consume = bucket.consume
+
+        if storage_is_async:
+            @wraps(func)
+            async def async_storage_wrapper(*args, **kwargs):
+                request = kwargs[request_name] if request_name in kwargs else args[request_position]
+                result = await consume(get_key(request))
+
+                if result.allowed:
+                    return await func(*args, **kwargs)
+                reject(result)
+
+            return async_storage_wrapper
+
+        elif is_async:
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                request = None
-                for arg in args:
-                    if hasattr(arg, 'client') and hasattr(arg, 'headers'):
-                        request = arg
-                        break
-                if not request:
-                    for value in kwargs.values():
-                        if hasattr(value, 'client') and hasattr(value, 'headers'):
-                            request = value
-                            break
-                if not request:
-                    available_types = [type(arg).__name__ for arg in args] + [type(v).__name__ for v in kwargs.values()]
-                    raise ValueError(
-                        f"No Request object found in function parameters. "
-                        f"Available parameter types: {available_types}. "
-                        f"Make sure your function includes 'request: Request' as a parameter."
-                    )
-                
-                user_key = get_key(request)
+                request = kwargs[request_name] if request_name in kwargs else args[request_position]
+                result = consume(get_key(request))
 
-                if bucket.allow_request(user_key):
+                if result.allowed:
                     return await func(*args, **kwargs)
-                else:
-                    # Get bucket info for error response
-                    bucket_info = bucket.get_bucket_info(user_key)
-                    
-                    # Calculate retry after
-                    seconds_per_token = refill_time / refill_rate
-                    retry_after = int(seconds_per_token)
-                    
-                    # Detailed error response
-                    headers = {
-                        "X-RateLimit-Limit": str(int(capacity)),
-                        "X-RateLimit-Remaining": "0",
-                        "X-RateLimit-Reset": str(retry_after),
-                        "Retry-After": str(retry_after)
-                    }
-                    
-                    raise HTTPException(
-                        status_code=429,
-                        detail={
-                            "message": "Rate limit exceeded",
-                            "limit": int(capacity),
-                            "remaining": 0,
-                            "reset_in_seconds": retry_after,
-                            "storage_type": storage_type
-                        },
-                        headers=headers
-                    )
+                reject(result)
                 
             return async_wrapper
         
         else:
             @wraps(func)
             def sync_wrapper(*args, **kwargs):
-                request = None
-                for arg in args:
-                    if hasattr(arg, 'client') and hasattr(arg, 'headers'):
-                        request = arg
-                        break
-                if not request:
-                    for value in kwargs.values():
-                        if hasattr(value, 'client') and hasattr(value, 'headers'):
-                            request = value
-                            break
-                if not request:
-                    available_types = [type(arg).__name__ for arg in args] + [type(v).__name__ for v in kwargs.values()]
-                    raise ValueError(
-                        f"No Request object found in function parameters. "
-                        f"Available parameter types: {available_types}. "
-                        f"Make sure your function includes 'request: Request' as a parameter."
-                    )
-                
-                user_key = get_key(request)
+                request = kwargs[request_name] if request_name in kwargs else args[request_position]
+                result = consume(get_key(request))
 
-                if bucket.allow_request(user_key):
+                if result.allowed:
                     return func(*args, **kwargs)
-                else:
-                    # Get bucket info for error response
-                    bucket_info = bucket.get_bucket_info(user_key)
-                    
-                    # Calculate retry after
-                    seconds_per_token = refill_time / refill_rate
-                    retry_after = int(seconds_per_token)
-                    
-                    # Detailed error response
-                    headers = {
-                        "X-RateLimit-Limit": str(int(capacity)),
-                        "X-RateLimit-Remaining": "0",
-                        "X-RateLimit-Reset": str(retry_after),
-                        "Retry-After": str(retry_after)
-                    }
-                    
-                    raise HTTPException(
-                        status_code=429,
-                        detail={
-                            "message": "Rate limit exceeded",
-                            "limit": int(capacity),
-                            "remaining": 0,
-                            "reset_in_seconds": retry_after,
-                            "storage_type": storage_type
-                        },
-                        headers=headers
-                    )
+                reject(result)
 
             return sync_wrapper
     
     return decorator
 
 
+def find_request_parameter(func: Callable) -> Tuple[str, Optional[int]]:
+    """
+    Find the parameter of func that receives the Request.
+
+    Looks for a parameter annotated with Request, or failing that one named
+    'request', so the wrappers can fetch it directly on every call.
+
+    Returns:
+        Tuple of (parameter name, position or None if keyword-only)
+    """
+    fallback = None
+    for position, param in enumerate(inspect.signature(func).parameters.values()):
+        if param.kind == param.KEYWORD_ONLY:
+            position = None
+        annotation = param.annotation
+        if annotation == "Request" or (isinstance(annotation, type) and issubclass(annotation, Request)):
+            return param.name, position
+        if param.name == "request" and fallback is None:
+            fallback = param.name, position
+
+    if fallback is None:
+        raise TypeError(
+            f"No Request parameter found on '{func.__name__}'. "
+            f"Make sure your function includes 'request: Request' as a parameter."
+        )
+    return fallback
+
+
 # Convenience functions for common configurations
 def rate_limit_memory(
     limit: Union[int, str],
@@ -203,7 +218,9 @@ def rate_limit_redis(
 ):
     """Convenience function for Redis-based rate limiting"""
     storage_config = {
-        "redis_client": None,  # Will use defaults
+        "host": redis_host,
+        "port": redis_port,
+        "db": redis_db,
         "key_prefix": key_prefix
     }
     
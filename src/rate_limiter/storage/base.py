@@ -1,5 +1,50 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional
+from typing import Tuple, Optional, NamedTuple
+from functools import lru_cache
+from fractions import Fraction
+import math
+
+
+# Token counts are stored as integer millitokens
+TOKEN_SCALE = 1000
+
+
+@lru_cache(maxsize=None)
+def refill_quantum(refill_rate: float, refill_time: float) -> Tuple[int, int]:
+    """
+    Get a whole number of milliseconds that refills a whole number of
+    millitokens, at about the limit's rate.
+
+    Refilling in these quanta keeps the bucket arithmetic in integers
+    without losing fractions of a token to rounding on frequent requests.
+    A quantum is no longer than the refill period, except for slow rates
+    that add under a millitoken per period, whose quantum is the time one
+    millitoken takes. Limits are fixed per decorator, so results are cached.
+
+    Returns:
+        Tuple of (quantum_ms, quantum_millitokens), both at least 1
+    """
+    if refill_rate <= 0 or refill_time <= 0:
+        raise ValueError("refill_rate and refill_time must be positive")
+
+    # Millitokens per millisecond, exact for the given floats
+    rate = Fraction(refill_rate) * TOKEN_SCALE / (Fraction(refill_time) * 1000)
+
+    # The closest fraction with a quantum that short. 1 / ceil(1 / rate) is
+    # always closer than zero, so a quantum never refills nothing
+    rate = rate.limit_denominator(max(math.ceil(refill_time * 1000), math.ceil(1 / rate)))
+    return rate.denominator, rate.numerator
+
+
+class ConsumeResult(NamedTuple):
+    """Outcome of trying to consume a token"""
+    allowed: bool
+    remaining: int
+    retry_after: float
+    # Seconds until the bucket is full again
+    reset_after: float = 0.0
+    # True when a denial was answered locally without asking the backend
+    short_circuited: bool = False
 
 
 class RateLimitStorage(ABC):
@@ -31,7 +76,7 @@ class RateLimitStorage(ABC):
         pass
 
     @abstractmethod
-    def atomic_consume_token(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> bool:
+    def atomic_consume_token_with_info(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> ConsumeResult:
         """
         Atomically check if a token can be consumed and consume it if possible.
         This is the critical method that prevents race conditions.
@@ -42,7 +87,18 @@ class RateLimitStorage(ABC):
             refill_rate: How many tokens to add per refill period
             refill_time: Seconds between refills
             
+        Returns:
+            ConsumeResult with whether the token was consumed, the whole tokens
+            left, the seconds until the next token is available and the
+            seconds until the bucket is full again
+        """
+        pass
+
+    def atomic_consume_token(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> bool:
+        """
+        Same as atomic_consume_token_with_info but only reports whether the token was consumed.
+
         Returns:
             True if token was consumed, False if rate limit exceeded
         """
-        pass
\ No newline at end of file
+        return self.atomic_consume_token_with_info(key, capacity, refill_rate, refill_time).allowed
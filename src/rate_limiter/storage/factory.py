@@ -1,35 +1,78 @@
 from .base import RateLimitStorage
 from .storage_memory import MemoryStorage
 from .storage_redis import RedisStorage
+from .storage_redis_fixed_window import FixedWindowRedisStorage
+from .storage_redis_sliding_counter import SlidingCounterRedisStorage
+from .storage_redis_async import AsyncRedisStorage
+from .storage_redis_reserving import ReservingRedisStorage
+from functools import lru_cache
 import redis
 
 
+REDIS_STORAGE_TYPES = {
+    "redis": RedisStorage,
+    "fixed_window": FixedWindowRedisStorage,
+    "sliding_counter": SlidingCounterRedisStorage,
+    "redis-async": AsyncRedisStorage,
+    "reserving": ReservingRedisStorage,
+}
+
+# Storage types whose methods are coroutines, they open asyncio clients themselves
+ASYNC_STORAGE_TYPES = {"redis-async"}
+
+
+@lru_cache(maxsize=None)
+def get_redis_client(host: str, port: int, db: int) -> redis.Redis:
+    """
+    Get the client, and so the connection pool, shared by every storage
+    using this Redis server and db.
+
+    Replies are left as bytes since the storages only read numbers from them,
+    and are parsed by hiredis, installed with the redis[hiredis] dependency.
+    The default RESP2 protocol is kept so servers older than Redis 6 work.
+    """
+    return redis.Redis(host=host, port=port, db=db)
+
+
 class StorageFactory:
     """Factory to create storage backends based on configuration"""
-    
+
     @staticmethod
     def create_storage(storage_type: str = "memory", **kwargs) -> RateLimitStorage:
         """
         Create a storage backend.
-        
+
         Args:
-            storage_type: Either "memory" or "redis"
-            **kwargs: Additional arguments for the storage backend
-            
+            storage_type: "memory", "redis" (token bucket), "fixed_window",
+                "sliding_counter" (approximate sliding window),
+                "redis-async" (token bucket for async endpoints)
+                or "reserving" (token bucket reserved from Redis in chunks)
+            **kwargs: Additional arguments for the storage backend.
+                The memory backend accepts max_buckets, the reserving backend
+                chunk_size and reservation_ttl.
+                Redis backends accept redis_client, or host/port/db to use a
+                connection pool shared with other storages, and key_prefix.
+
         Returns:
             A storage backend instance
         """
         if storage_type == "memory":
-            return MemoryStorage()
-        elif storage_type == "redis":
+            return MemoryStorage(**kwargs)
+        elif storage_type in REDIS_STORAGE_TYPES:
             # Extract Redis-specific connection parameters
+            redis_client = kwargs.pop("redis_client", None)
             host = kwargs.pop("host", "localhost")
             port = kwargs.pop("port", 6379)
             db = kwargs.pop("db", 0)
             key_prefix = kwargs.pop("key_prefix", "rate_limit:")
 
-            # Create Redis client
-            redis_client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
-            return RedisStorage(redis_client=redis_client, key_prefix=key_prefix)
+            storage_cls = REDIS_STORAGE_TYPES[storage_type]
+            if storage_type in ASYNC_STORAGE_TYPES:
+                return storage_cls(redis_client=redis_client, key_prefix=key_prefix, host=host, port=port, db=db)
+
+            # Reuse the pool for this server instead of opening a new one per decorator
+            if redis_client is None:
+                redis_client = get_redis_client(host, port, db)
+            return storage_cls(redis_client=redis_client, key_prefix=key_prefix, **kwargs)
         else:
-            raise ValueError(f"Unknown storage type: {storage_type}")
\ No newline at end of file
+            raise ValueError(f"Unknown storage type: {storage_type}")
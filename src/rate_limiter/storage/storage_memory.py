@@ -1,40 +1,156 @@
-from .base import RateLimitStorage
+from .base import RateLimitStorage, ConsumeResult, TOKEN_SCALE, refill_quantum
 from typing import Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
 import time
 
 
+# Number of lock stripes, keys hash onto one of them. A power of two, so
+# the stripe is picked by masking the hash
+LOCK_STRIPES = 64
+STRIPE_MASK = LOCK_STRIPES - 1
+
+# Most buckets kept by default, the least recently used are dropped first
+MAX_BUCKETS = 100_000
+
+# Requests on a stripe between sweeps for idle buckets
+SWEEP_INTERVAL = 1_000
+
+
+@dataclass(slots=True)
+class Bucket:
+    """
+    Token bucket state, updated in place on every request.
+
+    Slotted, so a bucket is no bigger than a 3-tuple and no new one is
+    allocated per request.
+    """
+    # Millitokens
+    tokens: int
+    # Last refill in monotonic milliseconds
+    last: int
+    # Monotonic milliseconds when the bucket is full again, None if unknown
+    full_at: Optional[int] = None
+
+
 class MemoryStorage(RateLimitStorage):
     """In-memory storage backend"""
-    def __init__(self) -> None:
-        self.buckets = {}
+    def __init__(self, max_buckets: int = MAX_BUCKETS) -> None:
+        # One LRU ordered dict of key -> Bucket per lock stripe
+        self._shards = [OrderedDict() for _ in range(LOCK_STRIPES)]
+        # Striped locks serialize updates to one key while different keys proceed in parallel
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._shard_size = max(1, max_buckets // LOCK_STRIPES)
+        self._requests = [0] * LOCK_STRIPES
 
     def get_bucket_state(self, key: str) -> Optional[Tuple[float, float]]:
-        return self.buckets.get(key)
-    
+        bucket = self._shards[hash(key) & STRIPE_MASK].get(key)
+        if bucket is None:
+            return None
+
+        return bucket.tokens / TOKEN_SCALE, (bucket.last + self._wall_offset_ms()) / 1000
+
     def set_bucket_state(self, key: str, tokens: float, timestamp: float) -> None:
-        self.buckets[key] = (tokens, timestamp)
+        stripe = hash(key) & STRIPE_MASK
+        # The limit isn't known here, so the bucket isn't swept as idle until its next request
+        bucket = Bucket(int(tokens * TOKEN_SCALE), int(timestamp * 1000) - self._wall_offset_ms())
+        with self._locks[stripe]:
+            buckets = self._shards[stripe]
+            buckets[key] = bucket
+            buckets.move_to_end(key)
+            if len(buckets) > self._shard_size:
+                buckets.popitem(last=False)
 
-    def atomic_consume_token(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> bool:
+    @staticmethod
+    def _wall_offset_ms() -> int:
         """
-        Note: This is NOT truly atomic for concurrent access,
-        but works fine for single-threaded scenarios.
+        Milliseconds between the monotonic clock and the wall clock.
+
+        Buckets are kept on the monotonic clock, but bucket state is read and
+        written with wall clock timestamps like the other storages.
         """
-        current_time = time.time()
+        return (time.time_ns() - time.monotonic_ns()) // 1_000_000
 
-        if key not in self.buckets:
-            self.buckets[key] = (capacity, current_time)
+    def atomic_consume_token_with_info(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> ConsumeResult:
+        """
+        Refill and consume under the lock stripe the key hashes to,
+        so concurrent requests for the same key cannot both take the last token.
+        """
+        capacity_milli = int(capacity * TOKEN_SCALE)
+        quantum_ms, quantum_tokens = refill_quantum(refill_rate, refill_time)
+        stripe = hash(key) & STRIPE_MASK
 
-        tokens, last_time = self.buckets[key]
+        with self._locks[stripe]:
+            current_ms = time.monotonic_ns() // 1_000_000
+            buckets = self._shards[stripe]
 
-        # Calculate refill
-        elapsed = current_time - last_time
-        added_tokens = (elapsed / refill_time) * refill_rate
-        tokens = min(capacity, tokens + added_tokens)
+            bucket = buckets.get(key)
+            if bucket is None:
+                # New buckets start with full capacity
+                bucket = buckets[key] = Bucket(capacity_milli, current_ms)
+                if len(buckets) > self._shard_size:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+            tokens = bucket.tokens
+            last_ms = bucket.last
+
+            # Refill in whole quanta, carrying the leftover time to the next call
+            quanta = (current_ms - last_ms) // quantum_ms
+            if quanta > 0:
+                tokens += quanta * quantum_tokens
+                last_ms += quanta * quantum_ms
+            if tokens >= capacity_milli:
+                tokens = capacity_milli
+                last_ms = current_ms
+
+            allowed = tokens >= TOKEN_SCALE
+            if allowed:
+                tokens -= TOKEN_SCALE
+
+            # Time until the bucket is full again, minus the carried leftover.
+            # A full bucket is the same as a missing one, so it can be dropped then
+            elapsed_ms = current_ms - last_ms
+            reset_ms = 0
+            if tokens < capacity_milli:
+                reset_ms = -(-(capacity_milli - tokens) // quantum_tokens) * quantum_ms - elapsed_ms
+            bucket.tokens = tokens
+            bucket.last = last_ms
+            bucket.full_at = current_ms + reset_ms
+
+            self._requests[stripe] += 1
+            if self._requests[stripe] >= SWEEP_INTERVAL:
+                self._requests[stripe] = 0
+                self._evict_full(buckets, current_ms)
+
+        # Time until the bucket holds a whole token again, minus the carried leftover
+        wait_ms = 0
+        if tokens < TOKEN_SCALE:
+            wait_ms = -(-(TOKEN_SCALE - tokens) // quantum_tokens) * quantum_ms - elapsed_ms
+
+        return ConsumeResult(allowed, tokens // TOKEN_SCALE, wait_ms / 1000, reset_ms / 1000)
+
+    def evict_idle(self) -> int:
+        """
+        Drop every bucket that has refilled to capacity since its last request.
+
+        Requests already sweep their own stripe now and then, this sweeps all
+        of them at once, e.g. from a background task.
+
+        Returns:
+            Number of buckets dropped
+        """
+        evicted = 0
+        for lock, buckets in zip(self._locks, self._shards):
+            with lock:
+                evicted += self._evict_full(buckets, time.monotonic_ns() // 1_000_000)
+        return evicted
 
-        if tokens >= 1:
-            self.buckets[key] = (tokens - 1, current_time)
-            return True
-        else:
-            self.buckets[key] = (tokens, current_time)
-            return False
-        
\ No newline at end of file
+    @staticmethod
+    def _evict_full(buckets: OrderedDict, current_ms: int) -> int:
+        """Drop the buckets of one stripe that are full by current_ms, the caller holds its lock"""
+        full = [key for key, bucket in buckets.items() if bucket.full_at is not None and bucket.full_at <= current_ms]
+        for key in full:
+            del buckets[key]
+        return len(full)
@@ -1,21 +1,64 @@
-from .base import RateLimitStorage
-from typing import Tuple, Optional
-import json
+from .base import RateLimitStorage, ConsumeResult, TOKEN_SCALE, refill_quantum
+from typing import List, Tuple, Optional
+from collections import OrderedDict
 import redis
 import time
 
 
+# Most keys remembered as denied per storage, the oldest are dropped first
+DENY_CACHE_SIZE = 10_000
+
+# Most seconds a denial is answered locally before asking Redis again
+DENY_CACHE_TTL = 1.0
+
+
+# Script wrappers shared by every storage instance, keyed by client class and Lua source
+_scripts = {}
+
+
+def get_shared_script(redis_client: redis.Redis, source: str):
+    """
+    Get the Script wrapper for a Lua source, registering it on first use.
+
+    The wrapper runs EVALSHA and only loads the script on NOSCRIPT, so sharing
+    it means new storage instances don't hash or load the same script again.
+    Call it with client= to run it on a specific connection. Sync and asyncio
+    clients get separate wrappers since their scripts are called differently.
+    """
+    cache_key = (type(redis_client), source)
+    script = _scripts.get(cache_key)
+    if script is None:
+        script = _scripts[cache_key] = redis_client.register_script(source)
+    return script
+
+
 class RedisStorage(RateLimitStorage):
-    """Redis-based storage backend with atomic operations"""
+    """
+    Redis-based storage backend with atomic operations.
+
+    A denied key is then denied locally, without asking Redis, until its
+    next token is due or for deny_cache_ttl seconds, whichever comes first.
+    Set deny_cache_ttl to 0 to always ask Redis.
+    """
+
+    # Most whole tokens one call of the consume token script takes
+    chunk_size = 1
     
-    def __init__(self, redis_client: redis.Redis, key_prefix: str = "rate_limit:"):
+    def __init__(self, redis_client: redis.Redis, key_prefix: str = "rate_limit:", deny_cache_ttl: float = DENY_CACHE_TTL):
         if redis_client is None:
-            redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+            redis_client = redis.Redis(host='localhost', port=6379, db=0)
 
         self.redis  = redis_client
+        self._init_storage(key_prefix, deny_cache_ttl)
+
+    def _init_storage(self, key_prefix: str, deny_cache_ttl: float) -> None:
+        """Set up the state that doesn't depend on the client, shared with AsyncRedisStorage"""
         self.key_prefix = key_prefix
+        self.deny_cache_ttl = deny_cache_ttl
+        self.deny_until = OrderedDict()
 
-        self.consume_token_script = self.redis.register_script(self._get_consume_token_lua_script())
+        # Consume token scripts specialized per limit, see _consume_script
+        self._consume_scripts = {}
 
     def _make_key(self, key: str) -> str:
         """Create a Redis key with our prefix"""
@@ -23,92 +66,214 @@ class RedisStorage(RateLimitStorage):
     
     def get_bucket_state(self, key: str) -> Optional[Tuple[float, float]]:
         redis_key = self._make_key(key)
-        data = self.redis.get(redis_key)
+        tokens, timestamp = self.redis.hmget(redis_key, 'tokens', 'timestamp')
 
-        if data is None:
+        if tokens is None or timestamp is None:
             return None
-        
-        try:
-            if isinstance(data, bytes):
-                data = data.decode('utf-8')
-                bucket_data = json.loads(data)
-                return bucket_data['tokens'], bucket_data['timestamp']
-        except (json.JSONDecodeError, KeyError):
-            return None
-        
+
+        return int(tokens) / TOKEN_SCALE, int(timestamp) / 1000
+
     def set_bucket_state(self, key: str, tokens:float, timestamp: float) -> None:
         redis_key = self._make_key(key)
-        data = {
-            'tokens': tokens,
-            'timestamp': timestamp
-        }
-        self.redis.setex(redis_key, 7200, json.dumps(data))
+        self.deny_until.pop(key, None)
+        pipe = self.redis.pipeline()
+        pipe.hset(redis_key, mapping={
+            'tokens': int(tokens * TOKEN_SCALE),
+            'timestamp': int(timestamp * 1000)
+        })
+        pipe.expire(redis_key, 7200)
+        pipe.execute()
     
-    def atomic_consume_token(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> bool:
+    def atomic_consume_token_with_info(
+            self,
+            key: str,
+            capacity: float,
+            refill_rate: float,
+            refill_time: float,
+            now_ms: Optional[int] = None
+    ) -> ConsumeResult:
         """
         Use a Lua script to atomically consume a token.
+
+        Timestamps are milliseconds from the Redis server clock, so every
+        process sharing the bucket agrees on the time whatever its own clock.
+        now_ms replaces the server clock, e.g. to simulate time passing in
+        tests. The local denial cache runs on the real clock, so it is skipped then.
         """
+        if now_ms is None:
+            cached = self._cached_denial(key)
+            if cached is not None:
+                return cached
+
         redis_key = self._make_key(key)
-        current_time = time.time()
 
         # Execute the Lua script
-        result = self.consume_token_script(
+        allowed, remaining, wait_ms, reset_ms = self._consume_script(self.redis, capacity, refill_rate, refill_time)(
             keys=[redis_key],
-            args=[capacity, refill_rate, refill_time, current_time, 7200]
+            args=[] if now_ms is None else [0, now_ms],
+            client=self.redis
+        )
+
+        result = ConsumeResult(allowed == 1, remaining, wait_ms / 1000, reset_ms / 1000)
+        if now_ms is None:
+            self._remember_denial(key, result)
+        return result
+
+    def atomic_consume_token(
+            self,
+            key: str,
+            capacity: float,
+            refill_rate: float,
+            refill_time: float,
+            now_ms: Optional[int] = None
+    ) -> bool:
+        return self.atomic_consume_token_with_info(key, capacity, refill_rate, refill_time, now_ms=now_ms).allowed
+
+    def atomic_consume_token_many(self, keys: List[str], capacity: float, refill_rate: float, refill_time: float) -> List[bool]:
+        """
+        Consume a token for each key, sending every script call in one pipeline.
+
+        Each call is still atomic for its own key, but the batch as a whole is
+        not, calls from other clients can run in between. A key may appear
+        more than once, its calls run in order. The denial cache is neither
+        read nor updated.
+        """
+        script = self._consume_script(self.redis, capacity, refill_rate, refill_time)
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            script(keys=[self._make_key(key)], client=pipe)
+        return [taken == 1 for taken, _, _, _ in pipe.execute()]
+
+    def _cached_denial(self, key: str) -> Optional[ConsumeResult]:
+        """
+        Deny locally while a key is likely to have no token.
+
+        Tokens can come back to a bucket before the retry time Redis reported:
+        ReservingRedisStorage returns unused reservations, and
+        set_bucket_state in another process resets the bucket without
+        clearing this cache. So denials are only cached for deny_cache_ttl
+        seconds, which bounds how long such changes go unseen here.
+        """
+        deadlines = self.deny_until.get(key)
+        if deadlines is None:
+            return None
+
+        expires, until, reset_until = deadlines
+        now = time.monotonic()
+        if expires > now and until > now:
+            return ConsumeResult(False, 0, until - now, reset_until - now, short_circuited=True)
+
+        self.deny_until.pop(key, None)
+        return None
+
+    def _remember_denial(self, key: str, result: ConsumeResult) -> None:
+        if result.allowed or self.deny_cache_ttl <= 0:
+            return
+
+        self.deny_until.pop(key, None)
+        now = time.monotonic()
+        self.deny_until[key] = (
+            now + min(result.retry_after, self.deny_cache_ttl),
+            now + result.retry_after,
+            now + result.reset_after
         )
+        if len(self.deny_until) > DENY_CACHE_SIZE:
+            try:
+                self.deny_until.popitem(last=False)
+            except KeyError:
+                pass
 
-        return bool(result)
+    def _consume_script(self, client, capacity: float, refill_rate: float, refill_time: float):
+        """
+        Get the consume token script for a limit.
+
+        Limits are fixed per decorator, so each one gets a script with its
+        numbers written into the source and only the key is sent per call.
+        Storages with the same limit share the script, client is only used
+        to register it.
+        """
+        limit = (capacity, refill_rate, refill_time)
+        script = self._consume_scripts.get(limit)
+        if script is None:
+            source = self._get_consume_token_lua_script(capacity, refill_rate, refill_time, self.chunk_size)
+            script = self._consume_scripts[limit] = get_shared_script(client, source)
+        return script
     
-    def _get_consume_token_lua_script(self) -> str:
+    def _get_consume_token_lua_script(self, capacity: float, refill_rate: float, refill_time: float, chunk_size: int = 1) -> str:
         """
         Lua script that runs atomically on Redis server.
         This prevents race conditions by doing all operations in one atomic step.
+        Takes up to chunk_size whole tokens, after adding back the millitokens
+        given in ARGV[1], if any. ARGV[2] can set the current time in
+        milliseconds, otherwise the Redis server clock is used.
+        Returns {tokens taken, whole tokens left, milliseconds until the next token,
+        milliseconds until the bucket is full}.
+
+        The key expires once the bucket would be full again, since a missing
+        key reads as a full bucket, so its TTL is also the reset time.
         """
-        return """
+        quantum_ms, quantum_tokens = refill_quantum(refill_rate, refill_time)
+        return f"""
         local key = KEYS[1]
-        local capacity = tonumber(ARGV[1])
-        local refill_rate = tonumber(ARGV[2])
-        local refill_time = tonumber(ARGV[3])
-        local current_time = tonumber(ARGV[4])
-        local expiration = tonumber(ARGV[5])
+        local capacity = {int(capacity * TOKEN_SCALE)}
+        local quantum_tokens = {quantum_tokens}
+        local quantum_ms = {quantum_ms}
+        local returned = tonumber(ARGV[1]) or 0
+        
+        -- Unless the caller gave the time, read it on the server, replicating
+        -- the writes rather than the script. Effects replication is the
+        -- default from Redis 5, where the call is a no-op
+        local current_ms = tonumber(ARGV[2])
+        if current_ms == nil then
+            if redis.replicate_commands then
+                redis.replicate_commands()
+            end
+            local now = redis.call('TIME')
+            current_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+        end
+        
+        -- Tokens are integer millitokens and times integer milliseconds, kept
+        -- in a hash and computed here rather than with HINCRBYFLOAT, so the
+        -- refill stays exact and each call is one HMGET and at most one HSET
         
-        -- Get current bucket state
-        local bucket_data = redis.call('GET', key)
-        local tokens, last_time
+        -- Get current bucket state, new buckets start with full capacity
+        local bucket = redis.call('HMGET', key, 'tokens', 'timestamp')
+        local tokens = tonumber(bucket[1]) or capacity
+        local last_ms = tonumber(bucket[2]) or current_ms
         
-        if bucket_data == false then
-            -- New bucket - start with full capacity
+        -- Refill in whole quanta, carrying the leftover time to the next call
+        local quanta = math.floor((current_ms - last_ms) / quantum_ms)
+        if quanta > 0 then
+            tokens = tokens + quanta * quantum_tokens
+            last_ms = last_ms + quanta * quantum_ms
+        end
+        tokens = tokens + returned
+        if tokens >= capacity then
             tokens = capacity
-            last_time = current_time
-        else
-            -- Parse existing bucket data
-            local data = cjson.decode(bucket_data)
-            tokens = data.tokens
-            last_time = data.timestamp
+            last_ms = current_ms
         end
         
-        -- Calculate refill
-        local elapsed = current_time - last_time
-        local added_tokens = (elapsed / refill_time) * refill_rate
-        tokens = math.min(capacity, tokens + added_tokens)
+        -- Consume as many whole tokens as are available, up to the chunk size
+        local taken = math.min({chunk_size}, math.floor(tokens / 1000))
+        tokens = tokens - taken * 1000
         
-        -- Try to consume a token
-        if tokens >= 1 then
-            -- Success - consume token and update state
-            tokens = tokens - 1
-            local new_data = cjson.encode({
-                tokens = tokens,
-                timestamp = current_time
-            })
-            redis.call('SETEX', key, expiration, new_data)
-            return 1
-        else
-            -- Failure - update timestamp but don't consume token
-            local new_data = cjson.encode({
-                tokens = tokens,
-                timestamp = current_time
-            })
-            redis.call('SETEX', key, expiration, new_data)
-            return 0
+        -- Time until the bucket holds a whole token again, and until it is
+        -- full again, minus the carried leftover
+        local elapsed_ms = current_ms - last_ms
+        local wait_ms = 0
+        local reset_ms = 0
+        if tokens < 1000 then
+            wait_ms = math.ceil((1000 - tokens) / quantum_tokens) * quantum_ms - elapsed_ms
+        end
+        if tokens < capacity then
+            reset_ms = math.ceil((capacity - tokens) / quantum_tokens) * quantum_ms - elapsed_ms
         end
+        
+        -- A denial with nothing refilled leaves the bucket and its expiry as they are
+        if taken > 0 or quanta > 0 or returned > 0 then
+            redis.call('HSET', key, 'tokens', tokens, 'timestamp', last_ms)
+            redis.call('PEXPIRE', key, math.max(reset_ms, 1))
+        end
+        
+        return {{taken, math.floor(tokens / 1000), wait_ms, reset_ms}}
         """
\ No newline at end of file
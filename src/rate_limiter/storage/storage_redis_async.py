@@ -0,0 +1,127 @@
+from .base import ConsumeResult, TOKEN_SCALE
+from .storage_redis import RedisStorage, DENY_CACHE_TTL
+from typing import List, Tuple, Optional
+import asyncio
+import redis.asyncio
+import weakref
+
+
+class AsyncRedisStorage(RedisStorage):
+    """
+    Redis-based storage backend for async endpoints.
+
+    Uses the same bucket layout and Lua script as RedisStorage, but every
+    method is a coroutine, so the event loop keeps serving other requests
+    while waiting on Redis.
+    """
+
+    def __init__(
+            self,
+            redis_client: Optional[redis.asyncio.Redis] = None,
+            key_prefix: str = "rate_limit:",
+            host: str = "localhost",
+            port: int = 6379,
+            db: int = 0,
+            deny_cache_ttl: float = DENY_CACHE_TTL
+    ):
+        self._client = redis_client
+        self._connection_kwargs = {"host": host, "port": port, "db": db}
+
+        # asyncio connections belong to the event loop that opened them, so
+        # without an explicit client every running loop gets its own
+        self._loop_clients = weakref.WeakKeyDictionary()
+
+        self._init_storage(key_prefix, deny_cache_ttl)
+
+    async def _get_redis(self) -> redis.asyncio.Redis:
+        """Get the client for the running event loop"""
+        if self._client is not None:
+            return self._client
+
+        loop = asyncio.get_running_loop()
+        entry = self._loop_clients.get(loop)
+        if entry is None:
+            client = redis.asyncio.Redis(**self._connection_kwargs)
+            closer = self._close_at_shutdown(client)
+            # Starting the generator registers it with the loop, so it is
+            # finalized by shutdown_asyncgens(), which asyncio.run calls last
+            await anext(closer)
+            entry = self._loop_clients[loop] = (client, closer)
+        return entry[0]
+
+    async def _close_at_shutdown(self, client: redis.asyncio.Redis):
+        """Close the client of a loop once the loop shuts down"""
+        try:
+            yield
+        finally:
+            self._loop_clients.pop(asyncio.get_running_loop(), None)
+            await client.aclose()
+
+    async def get_bucket_state(self, key: str) -> Optional[Tuple[float, float]]:
+        redis_key = self._make_key(key)
+        client = await self._get_redis()
+        tokens, timestamp = await client.hmget(redis_key, 'tokens', 'timestamp')
+
+        if tokens is None or timestamp is None:
+            return None
+
+        return int(tokens) / TOKEN_SCALE, int(timestamp) / 1000
+
+    async def set_bucket_state(self, key: str, tokens: float, timestamp: float) -> None:
+        redis_key = self._make_key(key)
+        self.deny_until.pop(key, None)
+        client = await self._get_redis()
+        async with client.pipeline() as pipe:
+            pipe.hset(redis_key, mapping={
+                'tokens': int(tokens * TOKEN_SCALE),
+                'timestamp': int(timestamp * 1000)
+            })
+            pipe.expire(redis_key, 7200)
+            await pipe.execute()
+
+    async def atomic_consume_token_with_info(
+            self,
+            key: str,
+            capacity: float,
+            refill_rate: float,
+            refill_time: float,
+            now_ms: Optional[int] = None
+    ) -> ConsumeResult:
+        if now_ms is None:
+            cached = self._cached_denial(key)
+            if cached is not None:
+                return cached
+
+        redis_key = self._make_key(key)
+        client = await self._get_redis()
+
+        allowed, remaining, wait_ms, reset_ms = await self._consume_script(client, capacity, refill_rate, refill_time)(
+            keys=[redis_key],
+            args=[] if now_ms is None else [0, now_ms],
+            client=client
+        )
+
+        result = ConsumeResult(allowed == 1, remaining, wait_ms / 1000, reset_ms / 1000)
+        if now_ms is None:
+            self._remember_denial(key, result)
+        return result
+
+    async def atomic_consume_token(
+            self,
+            key: str,
+            capacity: float,
+            refill_rate: float,
+            refill_time: float,
+            now_ms: Optional[int] = None
+    ) -> bool:
+        result = await self.atomic_consume_token_with_info(key, capacity, refill_rate, refill_time, now_ms=now_ms)
+        return result.allowed
+
+    async def atomic_consume_token_many(self, keys: List[str], capacity: float, refill_rate: float, refill_time: float) -> List[bool]:
+        client = await self._get_redis()
+        script = self._consume_script(client, capacity, refill_rate, refill_time)
+        async with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                await script(keys=[self._make_key(key)], client=pipe)
+            replies = await pipe.execute()
+        return [taken == 1 for taken, _, _, _ in replies]
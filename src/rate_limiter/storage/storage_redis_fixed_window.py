@@ -0,0 +1,81 @@
+from .base import RateLimitStorage, ConsumeResult
+from .storage_redis import get_shared_script
+from typing import Tuple, Optional
+import redis
+import time
+
+
+class FixedWindowRedisStorage(RateLimitStorage):
+    """Redis-based fixed window counter backend using a single INCR per request"""
+
+    def __init__(self, redis_client: redis.Redis, key_prefix: str = "rate_limit:"):
+        if redis_client is None:
+            redis_client = redis.Redis(host='localhost', port=6379, db=0)
+
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+
+        self.incr_script = get_shared_script(self.redis, self._get_incr_lua_script())
+
+    def _make_key(self, key: str, window: int) -> str:
+        """Create a Redis key with our prefix and the window number"""
+        return f"{self.key_prefix}{key}:{window}"
+
+    def get_bucket_state(self, key: str) -> Optional[Tuple[float, float]]:
+        # Counters are keyed per window, there is no token bucket to report
+        return None
+
+    def set_bucket_state(self, key: str, tokens: float, timestamp: float) -> None:
+        """
+        Reset the key by deleting its window counters.
+
+        Counters hold requests rather than tokens, and neither the capacity nor
+        the window length is known here, so tokens and timestamp can't be
+        stored. The key starts its current window with the full allowance.
+        """
+        pattern = self._escape_pattern(f"{self.key_prefix}{key}:") + "*"
+        keys = list(self.redis.scan_iter(match=pattern))
+        if keys:
+            self.redis.delete(*keys)
+
+    @staticmethod
+    def _escape_pattern(key: str) -> str:
+        """Escape glob characters so SCAN matches the text literally"""
+        for char in "\\*?[]":
+            key = key.replace(char, "\\" + char)
+        return key
+
+    def atomic_consume_token_with_info(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> ConsumeResult:
+        """
+        Count the request against the current window with one atomic INCR.
+
+        Each window lasts refill_time seconds and admits capacity requests.
+        The whole window resets at once, so refill_rate is not used.
+        """
+        current_time = time.time()
+        window = int(current_time // refill_time)
+        redis_key = self._make_key(key, window)
+
+        count = self.incr_script(
+            keys=[redis_key],
+            args=[int(refill_time * 1000)],
+            client=self.redis
+        )
+
+        remaining = max(0, int(capacity - count))
+        reset_after = (window + 1) * refill_time - current_time
+        retry_after = reset_after if remaining == 0 else 0.0
+        return ConsumeResult(count <= capacity, remaining, retry_after, reset_after)
+
+    def _get_incr_lua_script(self) -> str:
+        """
+        Lua script that increments the window counter and sets its expiry
+        only when the counter is created, so every request is one INCR.
+        """
+        return """
+        local count = redis.call('INCR', KEYS[1])
+        if count == 1 then
+            redis.call('PEXPIRE', KEYS[1], ARGV[1])
+        end
+        return count
+        """
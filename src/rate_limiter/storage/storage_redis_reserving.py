@@ -0,0 +1,110 @@
+from .base import ConsumeResult, TOKEN_SCALE
+from .storage_redis import RedisStorage, DENY_CACHE_TTL
+from typing import List, Optional
+import redis
+import threading
+import time
+
+
+class ReservingRedisStorage(RedisStorage):
+    """
+    Redis token bucket backend that reserves tokens in chunks.
+
+    Each call to the Lua script takes up to chunk_size tokens from the shared
+    bucket and the process hands out the rest locally, so Redis sees about one
+    call per chunk_size requests. Reserved tokens are held for at most
+    reservation_ttl seconds, unused ones go back to the bucket with the next
+    call for the key.
+
+    The bucket still never gives out more than its limit, but a process can
+    sit on up to chunk_size - 1 tokens that other processes can't use.
+    """
+
+    def __init__(
+            self,
+            redis_client: redis.Redis,
+            key_prefix: str = "rate_limit:",
+            chunk_size: int = 10,
+            reservation_ttl: float = 1.0,
+            deny_cache_ttl: float = DENY_CACHE_TTL
+    ):
+        super().__init__(redis_client, key_prefix, deny_cache_ttl)
+        self.chunk_size = chunk_size
+        self.reservation_ttl = reservation_ttl
+
+        # key -> [reserved tokens, monotonic expiry, whole tokens left in Redis when reserved]
+        self._reservations = {}
+        self._reservation_lock = threading.Lock()
+
+    def set_bucket_state(self, key: str, tokens: float, timestamp: float) -> None:
+        with self._reservation_lock:
+            self._reservations.pop(key, None)
+        super().set_bucket_state(key, tokens, timestamp)
+
+    def atomic_consume_token_with_info(
+            self,
+            key: str,
+            capacity: float,
+            refill_rate: float,
+            refill_time: float,
+            now_ms: Optional[int] = None
+    ) -> ConsumeResult:
+        """
+        Spend a reserved token if one is held, otherwise reserve a new chunk
+        with the consume token script. now_ms only sets the script's clock,
+        reservations always expire on the real clock.
+        """
+        now = time.monotonic()
+        returned = 0
+
+        with self._reservation_lock:
+            reservation = self._reservations.get(key)
+            if reservation is not None:
+                tokens, expires, shared_remaining = reservation
+                if expires > now:
+                    tokens -= 1
+                    if tokens:
+                        reservation[0] = tokens
+                    else:
+                        del self._reservations[key]
+                    return ConsumeResult(True, tokens + shared_remaining, 0.0)
+
+                # Expired, the tokens go back with this call
+                del self._reservations[key]
+                returned = tokens
+
+        # A known empty bucket can be denied locally, unless tokens are going back to it
+        if not returned and now_ms is None:
+            cached = self._cached_denial(key)
+            if cached is not None:
+                return cached
+
+        taken, remaining, wait_ms, reset_ms = self._consume_script(self.redis, capacity, refill_rate, refill_time)(
+            keys=[self._make_key(key)],
+            args=[returned * TOKEN_SCALE] if now_ms is None else [returned * TOKEN_SCALE, now_ms],
+            client=self.redis
+        )
+
+        if taken > 1:
+            with self._reservation_lock:
+                reservation = self._reservations.get(key)
+                if reservation is None:
+                    self._reservations[key] = [taken - 1, now + self.reservation_ttl, remaining]
+                else:
+                    # Another thread reserved meanwhile, keep both chunks
+                    reservation[0] += taken - 1
+                    reservation[1] = now + self.reservation_ttl
+                    reservation[2] = remaining
+
+        if taken:
+            retry_after = wait_ms / 1000 if taken == 1 else 0.0
+            return ConsumeResult(True, remaining + taken - 1, retry_after, reset_ms / 1000)
+
+        result = ConsumeResult(False, remaining, wait_ms / 1000, reset_ms / 1000)
+        if now_ms is None:
+            self._remember_denial(key, result)
+        return result
+
+    def atomic_consume_token_many(self, keys: List[str], capacity: float, refill_rate: float, refill_time: float) -> List[bool]:
+        """Consume one by one, a pipelined script call can't hand its leftover chunk to the next one"""
+        return [self.atomic_consume_token(key, capacity, refill_rate, refill_time) for key in keys]
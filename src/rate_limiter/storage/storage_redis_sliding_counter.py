@@ -0,0 +1,94 @@
+from .base import ConsumeResult
+from .storage_redis import get_shared_script
+from .storage_redis_fixed_window import FixedWindowRedisStorage
+import redis
+import time
+
+
+class SlidingCounterRedisStorage(FixedWindowRedisStorage):
+    """
+    Redis-based approximate sliding window backend.
+
+    Keeps a counter per fixed window like FixedWindowRedisStorage, but counts
+    the previous window too, weighted by how much of it still overlaps the
+    sliding window. Clients can't get twice the limit through by bursting
+    on both sides of a window boundary.
+    """
+
+    def __init__(self, redis_client: redis.Redis, key_prefix: str = "rate_limit:"):
+        super().__init__(redis_client, key_prefix)
+
+        self.sliding_script = get_shared_script(self.redis, self._get_sliding_lua_script())
+
+    def atomic_consume_token_with_info(self, key: str, capacity: float, refill_rate: float, refill_time: float) -> ConsumeResult:
+        """
+        Check the weighted estimate and count the request in one Lua call.
+
+        The sliding window lasts refill_time seconds and admits capacity
+        requests. Denied requests are not counted, so a client retrying while
+        limited still gets through once the estimate falls.
+        """
+        current_time = time.time()
+        window = int(current_time // refill_time)
+        elapsed = current_time - window * refill_time
+
+        allowed, current, previous = self.sliding_script(
+            keys=[self._make_key(key, window), self._make_key(key, window - 1)],
+            args=[int(refill_time * 1000), int(elapsed * 1000), capacity],
+            client=self.redis
+        )
+
+        estimate = previous * (1 - elapsed / refill_time) + current
+        remaining = max(0, int(capacity - estimate))
+        retry_after = self._retry_after(capacity, refill_time, elapsed, current, previous) if remaining == 0 else 0.0
+        return ConsumeResult(allowed == 1, remaining, retry_after, self._reset_after(refill_time, elapsed, current, previous))
+
+    @staticmethod
+    def _retry_after(capacity: float, refill_time: float, elapsed: float, current: int, previous: int) -> float:
+        """Seconds until the estimate leaves room for one more request"""
+        if current + 1 <= capacity and previous > 0:
+            # Room comes within this window as the previous window's weight falls
+            fraction = 1 - (capacity - current - 1) / previous
+            return max(0.0, fraction * refill_time - elapsed)
+
+        # Wait for the next window, where this window's count is the weighted one
+        fraction = max(0.0, 1 - (capacity - 1) / current) if current > 0 else 0.0
+        return refill_time - elapsed + fraction * refill_time
+
+    @staticmethod
+    def _reset_after(refill_time: float, elapsed: float, current: int, previous: int) -> float:
+        """Seconds until both counters have slid out of the window"""
+        if current > 0:
+            return 2 * refill_time - elapsed
+        if previous > 0:
+            return refill_time - elapsed
+        return 0.0
+
+    def _get_sliding_lua_script(self) -> str:
+        """
+        Lua script that estimates the requests in the sliding window from the
+        current and previous counters, and counts the request only if it fits.
+        Returns {allowed, current count, previous count}.
+        """
+        return """
+        local window_ms = tonumber(ARGV[1])
+        local elapsed_ms = tonumber(ARGV[2])
+        local limit = tonumber(ARGV[3])
+
+        local counts = redis.call('MGET', KEYS[1], KEYS[2])
+        local current = tonumber(counts[1]) or 0
+        local previous = tonumber(counts[2]) or 0
+
+        -- Weight the previous window by how much of it the sliding window still covers
+        local estimate = previous * (window_ms - elapsed_ms) / window_ms + current
+        if estimate + 1 > limit then
+            return {0, current, previous}
+        end
+
+        -- Keep the counter through the next window, where it is the previous one
+        current = redis.call('INCR', KEYS[1])
+        if current == 1 then
+            redis.call('PEXPIRE', KEYS[1], 2 * window_ms)
+        end
+        return {1, current, previous}
+        """
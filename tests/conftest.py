@@ -0,0 +1,19 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--slow", action="store_true", default=False, help="also run tests that wait on the real clock")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: waits on the real clock, only runs with --slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--slow"):
+        return
+
+    skip_slow = pytest.mark.skip(reason="waits on the real clock, run with --slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
@@ -0,0 +1,80 @@
+from src.rate_limiter.decorator import rate_limit
+from src.rate_limiter.storage.factory import StorageFactory
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import time
+
+
+app = FastAPI()
+
+@app.get("/test-basic")
+@rate_limit("3/minute", storage_type="fixed_window", key_func=lambda r: "fixed_basic_key")
+def basic_fixed_window(request: Request):
+    return {"message": "Success!"}
+
+@app.get("/test-window")
+@rate_limit(2, 2, 1, storage_type="fixed_window", key_func=lambda r: "fixed_window_key")
+def short_window(request: Request):
+    return {"message": "Short window"}
+
+def test_basic_functionality():
+    """Test that the fixed window admits capacity requests per window"""
+    client = TestClient(app)
+
+    print("=== Testing Fixed Window Rate Limiting (3/minute) ===")
+
+    for i in range(3):
+        response = client.get("/test-basic")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    response = client.get("/test-basic")
+    print(f"Request 4: Status {response.status_code}")
+    assert response.status_code == 429
+    assert response.json()["detail"]["storage_type"] == "fixed_window"
+
+    print("✅ Fixed window test passed!\n")
+
+def test_window_reset():
+    """Test that the counter resets when a new window starts"""
+    client = TestClient(app)
+
+    print("=== Testing Fixed Window Reset (2 per second) ===")
+
+    # Start at the beginning of a window so both requests land in it
+    time.sleep(1 - time.time() % 1)
+
+    for i in range(2):
+        response = client.get("/test-window")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    response = client.get("/test-window")
+    print(f"Request 3: Status {response.status_code}")
+    assert response.status_code == 429
+
+    time.sleep(1)
+
+    response = client.get("/test-window")
+    print(f"Next window: Status {response.status_code}")
+    assert response.status_code == 200
+
+    print("✅ Fixed window reset test passed!\n")
+
+def test_set_bucket_state_resets_counters():
+    """Test that writing bucket state starts the key's window over"""
+    storage = StorageFactory.create_storage("fixed_window", key_prefix="fixed_state_test:")
+
+    for i in range(2):
+        assert storage.atomic_consume_token("reset*user", 2, 2, 60)
+    assert not storage.atomic_consume_token("reset*user", 2, 2, 60)
+    assert storage.atomic_consume_token("reset_user", 2, 2, 60)
+
+    storage.set_bucket_state("reset*user", 2, time.time())
+    assert storage.atomic_consume_token("reset*user", 2, 2, 60)
+
+    # Only the key itself is reset, glob characters in it match literally
+    assert storage.atomic_consume_token("reset_user", 2, 2, 60)
+    assert not storage.atomic_consume_token("reset_user", 2, 2, 60)
+
+    print("✅ Fixed window state reset test passed!\n")
@@ -0,0 +1,7 @@
+import importlib
+
+
+def test_storage_factory_imports():
+    """Test that the storage factory and every backend it imports load cleanly"""
+    factory = importlib.import_module("src.rate_limiter.storage.factory")
+    assert factory.StorageFactory.create_storage("memory") is not None
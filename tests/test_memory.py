@@ -1,8 +1,11 @@
 from src.rate_limiter.decorator import rate_limit_memory
+from src.rate_limiter.storage.storage_memory import MemoryStorage, LOCK_STRIPES
 from fastapi import FastAPI, Request
 from fastapi.testclient import TestClient
 from datetime import datetime
 import uvicorn
+import pytest
+import threading
 import time
 
 
@@ -106,6 +109,12 @@ def test_numeric_format():
     print(f"Request 3: Status {response.status_code}")
     assert response.status_code == 429
 
+    # Next token arrives 30 seconds after the bucket was emptied
+    print(f"Rate limit headers: {dict(response.headers)}")
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+    assert response.headers["Retry-After"] == "30"
+    assert response.headers["X-RateLimit-Reset"] == "60"
+
     print("✅ Numeric format test passed!\n")
 
 def test_token_refill():
@@ -136,6 +145,103 @@ def test_token_refill():
     
     print("✅ Token refill test passed!\n")
 
+def test_concurrent_consume_same_key():
+    """Test that threads released together on one key get exactly capacity tokens"""
+    storage = MemoryStorage()
+    capacity = 10
+    thread_count = 50
+    barrier = threading.Barrier(thread_count)
+    results = [None] * thread_count
+
+    def make_request(thread_id):
+        barrier.wait()
+        results[thread_id] = storage.atomic_consume_token("shared_user", capacity, 1, 3600)
+
+    threads = [threading.Thread(target=make_request, args=(i,)) for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Allowed {results.count(True)} of {thread_count} concurrent requests")
+    assert results.count(True) == capacity
+
+def test_bucket_state_uses_wall_clock():
+    """Test that bucket state timestamps are wall clock seconds like the other storages"""
+    storage = MemoryStorage()
+
+    storage.set_bucket_state("stale_user", 0, time.time() - 3600)
+    tokens, timestamp = storage.get_bucket_state("stale_user")
+    assert tokens == 0
+    assert abs(timestamp - (time.time() - 3600)) < 1
+
+    # An hour has passed since the bucket was emptied, so it is full again
+    result = storage.atomic_consume_token_with_info("stale_user", 2, 1, 60)
+    print(f"Consume after an hour: {result}")
+    assert result.allowed
+    assert result.remaining == 1
+
+def test_slow_refill_rate():
+    """Test rates that add less than a thousandth of a token per period"""
+    storage = MemoryStorage()
+
+    assert storage.atomic_consume_token("slow_user", 1, 0.0001, 1)
+    result = storage.atomic_consume_token_with_info("slow_user", 1, 0.0001, 1)
+    print(f"Second request: {result}")
+    assert not result.allowed
+    assert abs(result.retry_after - 10000) < 1
+
+    with pytest.raises(ValueError):
+        rate_limit_memory(1, 0, 60)
+
+    # Under a millitoken per second still refills, a millitoken at a time
+    assert storage.atomic_consume_token("slower_user", 1, 4e-7, 1)
+    result = storage.atomic_consume_token_with_info("slower_user", 1, 4e-7, 1)
+    assert not result.allowed
+    assert abs(result.retry_after - 2_500_000) < 1
+
+def test_non_round_refill_period():
+    """Test that a period that isn't a whole number of milliseconds still refills within about a period"""
+    storage = MemoryStorage()
+
+    assert storage.atomic_consume_token("odd_user", 1, 1, 0.1234567)
+    result = storage.atomic_consume_token_with_info("odd_user", 1, 1, 0.1234567)
+    print(f"Second request: {result}")
+    assert not result.allowed
+    assert result.retry_after < 0.2
+    assert result.reset_after < 0.2
+
+    time.sleep(0.2)
+    assert storage.atomic_consume_token("odd_user", 1, 1, 0.1234567)
+
+def test_idle_buckets_evicted():
+    """Test that buckets are dropped once refilled, and capped in number"""
+    storage = MemoryStorage()
+
+    # 1 token every 50 milliseconds
+    assert storage.atomic_consume_token("idle_user", 1, 1, 0.05)
+    assert storage.get_bucket_state("idle_user") is not None
+    assert storage.evict_idle() == 0
+
+    time.sleep(0.1)
+    assert storage.evict_idle() == 1
+    assert storage.get_bucket_state("idle_user") is None
+
+    # With one bucket per stripe, new keys push out the least recently used
+    storage = MemoryStorage(max_buckets=LOCK_STRIPES)
+    for i in range(1000):
+        storage.atomic_consume_token(f"user_{i}", 5, 1, 60)
+    assert sum(len(buckets) for buckets in storage._shards) <= LOCK_STRIPES
+    assert storage.get_bucket_state("user_999") is not None
+
+def test_missing_request_rejected():
+    """Test that endpoints without a Request parameter fail at decoration time"""
+    with pytest.raises(TypeError):
+        @rate_limit_memory("3/minute")
+        async def no_request_endpoint(user_id: str):
+            return {"message": "Never registered"}
+
+
 if __name__ == "__main__":
     print("Starting Rate Limiter Tests...\n")
     
@@ -1,105 +1,115 @@
+import functools
+import sys
 import threading
 import time
+import pytest
 import redis
 from concurrent.futures import ThreadPoolExecutor
 from src.rate_limiter.storage.storage_memory import MemoryStorage
 from src.rate_limiter.storage.storage_redis import RedisStorage
 
 
+# Most concurrent requests a test sends
+MAX_THREADS = 100
 
-def test_race_condition_memory():
-    """Test memory storage with concurrent access - may show race condition"""
-    print("=== Testing Memory Storage Race Condition ===")
-    
-    storage = MemoryStorage()
-    results = []
+# Seconds to wait for every party at a barrier, so a pool with too few
+# free workers raises BrokenBarrierError instead of hanging the suite
+BARRIER_TIMEOUT = 10
+
+# Worker threads shared by every test, so no test pays for starting its own.
+# Racing requests all wait on a barrier, so there is one per request
+_POOL = ThreadPoolExecutor(max_workers=MAX_THREADS)
+
+
+@functools.cache
+def _get_redis() -> redis.Redis:
+    """
+    Redis client shared by every test, created on first use. Creating it
+    doesn't connect, so a missing server still shows up as a
+    ConnectionError inside each test.
+    """
+    pool = redis.ConnectionPool(
+        host='localhost', port=6379, db=0, decode_responses=False,
+        socket_keepalive=True, max_connections=MAX_THREADS
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def _fast_flush(client: redis.Redis):
+    """
+    Check the connection and clear the db in a single round trip.
+
+    FLUSHDB ASYNC replies before the keys are freed, so the test doesn't
+    wait on the server dropping the previous test's data. Servers older
+    than 4.0 don't have it and get a plain FLUSHDB.
+    """
+    pipe = client.pipeline(transaction=True)
+    pipe.ping()
+    pipe.flushdb(asynchronous=True)
+    try:
+        pipe.execute()
+    except redis.ResponseError:
+        client.flushdb()
+
+
+def _report(results, finished):
+    """Print each request's outcome in the order it finished, with a single write"""
+    sys.stdout.write("".join(
+        f"Thread {thread_id}: Request {'ALLOWED' if results[thread_id] else 'DENIED'}\n"
+        for thread_id in sorted(range(len(results)), key=finished.__getitem__)
+    ))
+
+
+def _race(storage, n_threads):
+    """
+    Send n_threads requests for a bucket holding one token at the same time.
+
+    Returns whether each request was allowed, and when each one finished.
+    """
+    results = [None] * n_threads
+    finished = [0] * n_threads
+    # Workers wait here until the main thread joins last and releases them together
+    barrier = threading.Barrier(n_threads + 1)
     
     def make_request(thread_id):
-        # Simulate multiple requests hitting at the same time
-        allowed = storage.atomic_consume_token("test_user", 1, 1, 60)  # 1 token, refill 1 per minute
-        results.append((thread_id, allowed))
-        if allowed:
-            print(f"Thread {thread_id}: Request ALLOWED")
-        else:
-            print(f"Thread {thread_id}: Request DENIED")
-    
-    # Start multiple threads simultaneously
-    threads = []
-    for i in range(5):
-        thread = threading.Thread(target=make_request, args=(i,))
-        threads.append(thread)
-    
-    # Start all threads at roughly the same time
-    for thread in threads:
-        thread.start()
-    
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
-    
-    allowed_count = sum(1 for _, allowed in results if allowed)
-    print(f"Total requests allowed: {allowed_count} (should be 1)")
-    
-    if allowed_count > 1:
-        print("⚠️  Race condition detected in memory storage!")
-    else:
-        print("✅ No race condition in memory storage (this time)")
-    
-    print()
+        barrier.wait(timeout=BARRIER_TIMEOUT)
+        results[thread_id] = storage.atomic_consume_token("test_user", 1, 1, 60)  # 1 token, refill 1 per minute
+        # Printing here would serialize the threads on stdout, report afterwards
+        finished[thread_id] = time.perf_counter_ns()
+    
+    # Park the requests on the shared pool, release them at once and wait for all of them
+    futures = [_POOL.submit(make_request, i) for i in range(n_threads)]
+    barrier.wait(timeout=BARRIER_TIMEOUT)
+    for future in futures:
+        future.result()
+    return results, finished
+
 
+def _show_race(name, storage):
+    """Print the outcome of five racing requests, for running this file as a script"""
+    print(f"=== Testing {name} Storage Race Condition ===")
+    results, finished = _race(storage, 5)
+    _report(results, finished)
+    print(f"Total requests allowed: {results.count(True)} (should be 1)\n")
 
-def test_race_condition_redis():
-    """Test Redis storage with concurrent access - should prevent race condition"""
-    print("=== Testing Redis Storage Race Condition ===")
+
+@pytest.fixture(params=["memory", "redis"])
+def storage(request):
+    if request.param == "memory":
+        return MemoryStorage()
     
     try:
-        # Connect to Redis
-        redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        redis_client.ping()  # Test connection
-        
-        # Clear any existing data
-        redis_client.flushdb()
-        
-        storage = RedisStorage(redis_client, "test:")
-        results = []
-        
-        def make_request(thread_id):
-            # Simulate multiple requests hitting at the same time
-            allowed = storage.atomic_consume_token("test_user", 1, 1, 60)  # 1 token, refill 1 per minute
-            results.append((thread_id, allowed))
-            if allowed:
-                print(f"Thread {thread_id}: Request ALLOWED")
-            else:
-                print(f"Thread {thread_id}: Request DENIED")
-        
-        # Start multiple threads simultaneously
-        threads = []
-        for i in range(5):
-            thread = threading.Thread(target=make_request, args=(i,))
-            threads.append(thread)
-        
-        # Start all threads at roughly the same time
-        for thread in threads:
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
-        
-        allowed_count = sum(1 for _, allowed in results if allowed)
-        print(f"Total requests allowed: {allowed_count} (should be 1)")
-        
-        if allowed_count == 1:
-            print("✅ Redis prevented race condition!")
-        else:
-            print("❌ Unexpected result with Redis")
-        
+        _fast_flush(_get_redis())
     except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure Redis is running on localhost:6379")
-    except Exception as e:
-        print(f"❌ Error testing Redis: {e}")
-    
-    print()
+        pytest.skip("Redis is not running on localhost:6379")
+    return RedisStorage(_get_redis(), "test:")
+
+
+@pytest.mark.parametrize("n_threads", [5, 20, MAX_THREADS])
+def test_race_condition(storage, n_threads):
+    """Test that concurrent requests for the last token let exactly one through"""
+    results, _ = _race(storage, n_threads)
+    assert results.count(True) == 1
 
 
 def stress_test_redis():
@@ -107,30 +117,34 @@ def stress_test_redis():
     print("=== Redis Stress Test ===")
     
     try:
-        redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        redis_client.ping()
-        redis_client.flushdb()
+        _fast_flush(_get_redis())
         
-        storage = RedisStorage(redis_client, "stress:")
+        # A blocking pool with one connection per worker, warmed up with
+        # parallel PINGs so connection setup isn't part of the stress run
+        pool = redis.BlockingConnectionPool(
+            host='localhost', port=6379, db=0, decode_responses=False,
+            max_connections=4, timeout=5
+        )
+        redis_client = redis.Redis(connection_pool=pool)
+        barrier = threading.Barrier(4)
+        
+        def warm_up(_):
+            barrier.wait(timeout=BARRIER_TIMEOUT)
+            redis_client.ping()
         
-        # Test with 10 tokens, 100 concurrent requests
-        results = []
+        list(_POOL.map(warm_up, range(4)))
+        
+        storage = RedisStorage(redis_client, "stress:")
         
-        def make_request(request_id):
-            allowed = storage.atomic_consume_token("stress_user", 10, 5, 60)  # 10 tokens
-            results.append(allowed)
-            return allowed
+        # Test with 10 tokens, 100 concurrent requests sent by 4 workers
+        # pipelining 25 each, so each worker waits on Redis once
+        def make_requests(_):
+            return storage.atomic_consume_token_many(["stress_user"] * 25, 10, 5, 60)  # 10 tokens
         
-        # Use ThreadPoolExecutor for better concurrency control
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = [executor.submit(make_request, i) for i in range(100)]
-            
-            # Wait for all requests to complete
-            for future in futures:
-                future.result()
+        results = [allowed for batch in _POOL.map(make_requests, range(4)) for allowed in batch]
         
-        allowed_count = sum(1 for allowed in results if allowed)
-        denied_count = sum(1 for allowed in results if not allowed)
+        allowed_count = results.count(True)
+        denied_count = results.count(False)
         
         print(f"Total requests: {len(results)}")
         print(f"Allowed: {allowed_count}")
@@ -142,6 +156,8 @@ def stress_test_redis():
         else:
             print(f"⚠️  Expected 10 allowed requests, got {allowed_count}")
         
+        pool.disconnect()
+        
     except redis.ConnectionError:
         print("❌ Could not connect to Redis. Make sure Redis is running on localhost:6379")
     except Exception as e:
@@ -150,62 +166,54 @@ def stress_test_redis():
 
 def test_token_refill_redis():
     """Test that tokens refill correctly over time with Redis"""
-    print("=== Testing Token Refill with Redis ===")
-    
     try:
-        redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        redis_client.ping()
-        redis_client.flushdb()
-        
-        storage = RedisStorage(redis_client, "refill:")
-        
-        # Use small refill time for testing
-        capacity = 2
-        refill_rate = 1
-        refill_time = 2  # 1 token every 2 seconds
-        
-        # Consume all tokens
-        result1 = storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time)
-        result2 = storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time)
-        result3 = storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time)
-        
-        print(f"Initial requests: {result1}, {result2}, {result3}")
-        print("Expected: True, True, False")
-        
-        # Wait for refill
-        print("Waiting 3 seconds for token refill...")
-        time.sleep(3)
-        
-        # Should be able to make one more request
-        result4 = storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time)
-        print(f"After refill: {result4}")
-        print("Expected: True")
-        
-        if result1 and result2 and not result3 and result4:
-            print("✅ Token refill test passed!")
-        else:
-            print("❌ Token refill test failed")
-        
+        _fast_flush(_get_redis())
     except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure Redis is running on localhost:6379")
-    except Exception as e:
-        print(f"❌ Error in refill test: {e}")
+        pytest.skip("Redis is not running on localhost:6379")
+    
+    storage = RedisStorage(_get_redis(), "refill:")
+    
+    # Use small refill time for testing
+    capacity = 2
+    refill_rate = 1
+    refill_time = 2  # 1 token every 2 seconds
+    
+    # Consume all tokens, with the script's clock pinned to t0
+    t0 = time.time_ns() // 1_000_000
+    results = [
+        storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time, now_ms=t0)
+        for _ in range(3)
+    ]
+    
+    # Should be able to make one more request 3 seconds later
+    results.append(storage.atomic_consume_token("refill_user", capacity, refill_rate, refill_time, now_ms=t0 + 3000))
+    
+    assert results == [True, True, False, True]
 
 
 if __name__ == "__main__":
     print("Testing Race Conditions and Redis Functionality\n")
     
-    # Test memory storage (may show race condition)
-    test_race_condition_memory()
+    # Test memory storage
+    _show_race("Memory", MemoryStorage())
     
-    # Test Redis storage (should prevent race condition)
-    test_race_condition_redis()
+    # Test Redis storage
+    try:
+        _fast_flush(_get_redis())
+        _show_race("Redis", RedisStorage(_get_redis(), "test:"))
+    except redis.ConnectionError:
+        print("❌ Could not connect to Redis. Make sure Redis is running on localhost:6379\n")
     
     # Stress test Redis
     stress_test_redis()
     
     # Test token refill
-    test_token_refill_redis()
+    print("=== Testing Token Refill with Redis ===")
+    try:
+        test_token_refill_redis()
+        print("✅ Token refill test passed!")
+    except pytest.skip.Exception:
+        print("❌ Could not connect to Redis. Make sure Redis is running on localhost:6379")
     
     print("Tests completed!")
     
@@ -1,8 +1,10 @@
 from src.rate_limiter.decorator import rate_limit_redis
+from src.rate_limiter.storage.factory import StorageFactory
 from fastapi import FastAPI, Request
 from fastapi.testclient import TestClient
 from datetime import datetime
 import uvicorn
+import pytest
 import time
 import redis
 
@@ -70,6 +72,12 @@ def test_basic_functionality():
     print(f"Rate limit headers: {dict(response.headers)}")
     assert "X-RateLimit-Limit" in response.headers
     assert "Retry-After" in response.headers
+
+    # Once denied, the key is rejected locally until its next token is due
+    response = client.get("/test-basic")
+    print(f"Request 5: Status {response.status_code}")
+    assert response.status_code == 429
+    assert response.headers["X-RateLimit-Mode"] == "short-circuit"
     
     print("✅ Basic rate limiting test passed!\n")
 
@@ -111,8 +119,9 @@ def test_numeric_format():
 
     print("✅ Numeric format test passed!\n")
 
+@pytest.mark.slow
 def test_token_refill():
-    """Test that tokens refill over time"""
+    """Test that tokens refill over time, end to end on the real clock"""
     client = TestClient(app)
 
     print("=== Testing Token Refill (waiting for refill) ===")
@@ -139,6 +148,70 @@ def test_token_refill():
     
     print("✅ Token refill test passed!\n")
 
+def test_refill_from_stored_state():
+    """Test that a bucket emptied an hour ago is refilled by the Redis server clock"""
+    storage = StorageFactory.create_storage("redis", key_prefix="state_test:")
+
+    storage.set_bucket_state("stale_user", 0, time.time() - 3600)
+    result = storage.atomic_consume_token_with_info("stale_user", 2, 1, 60)
+    print(f"Consume after an hour: {result}")
+    assert result.allowed
+    assert result.remaining == 1
+
+    print("✅ Stored state refill test passed!\n")
+
+def test_slow_refill_rate():
+    """Test rates that add less than a thousandth of a token per period"""
+    storage = StorageFactory.create_storage("redis", key_prefix="slow_test:")
+
+    assert storage.atomic_consume_token("slow_user", 1, 0.0001, 1)
+    result = storage.atomic_consume_token_with_info("slow_user", 1, 0.0001, 1)
+    print(f"Second request: {result}")
+    assert not result.allowed
+    assert abs(result.retry_after - 10000) < 1
+
+    print("✅ Slow refill rate test passed!\n")
+
+def test_consume_many():
+    """Test that a pipelined batch consumes in order and per key"""
+    storage = StorageFactory.create_storage("redis", key_prefix="many_test:")
+
+    results = storage.atomic_consume_token_many(["many_a", "many_a", "many_b", "many_a"], 2, 1, 60)
+    print(f"Batch results: {results}")
+    assert results == [True, True, True, False]
+
+    print("✅ Batched consume test passed!\n")
+
+def test_script_reloaded_after_flush():
+    """Test that the consume script is loaded again after the server forgets it"""
+    storage = StorageFactory.create_storage("redis", key_prefix="noscript_test:")
+
+    assert storage.atomic_consume_token("noscript_user", 2, 1, 60)
+    storage.redis.script_flush()
+    assert storage.atomic_consume_token("noscript_user", 2, 1, 60)
+    assert storage.atomic_consume_token_many(["noscript_user"], 2, 1, 60) == [False]
+
+    print("✅ Script reload test passed!\n")
+
+def test_cached_denial_expires():
+    """Test that a reset from another process is seen once the cached denial expires"""
+    worker = StorageFactory.create_storage("redis", key_prefix="deny_test:", deny_cache_ttl=0.1)
+    admin = StorageFactory.create_storage("redis", key_prefix="deny_test:")
+
+    # Spend the whole day's tokens
+    assert all(worker.atomic_consume_token("deny_user", 10, 10, 86400) for _ in range(10))
+    assert not worker.atomic_consume_token("deny_user", 10, 10, 86400)
+
+    admin.set_bucket_state("deny_user", 10, time.time())
+    result = worker.atomic_consume_token_with_info("deny_user", 10, 10, 86400)
+    assert result.short_circuited
+    assert result.retry_after > 8000
+
+    time.sleep(0.15)
+    assert worker.atomic_consume_token("deny_user", 10, 10, 86400)
+
+    print("✅ Cached denial expiry test passed!\n")
+
 if __name__ == "__main__":
     # Clear Redis before tests to ensure a clean state
     r = redis.Redis(host='localhost', port=6379, db=0)
@@ -0,0 +1,96 @@
+from src.rate_limiter.decorator import rate_limit
+from src.rate_limiter.algorithms.token_bucket import TokenBucket
+from src.rate_limiter.storage.storage_redis_async import AsyncRedisStorage
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import asyncio
+import pytest
+
+
+app = FastAPI()
+
+@app.get("/test-basic")
+@rate_limit("3/minute", storage_type="redis-async", key_func=lambda r: "async_basic_key")
+async def basic_async(request: Request):
+    return {"message": "Success!"}
+
+@app.get("/test-user")
+@rate_limit("2/minute", storage_type="redis-async", key_func=lambda r: r.headers.get("X-User-ID", "test-user"))
+async def user_route_async(request: Request):
+    return {"message": "User-specific rate limiting"}
+
+def test_basic_functionality():
+    """Test rate limiting of an async endpoint with async Redis storage"""
+    client = TestClient(app)
+
+    print("=== Testing Async Redis Rate Limiting (3/minute) ===")
+
+    for i in range(3):
+        response = client.get("/test-basic")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    response = client.get("/test-basic")
+    print(f"Request 4: Status {response.status_code}")
+    assert response.status_code == 429
+    assert response.json()["detail"]["storage_type"] == "redis-async"
+    assert "Retry-After" in response.headers
+
+    print("✅ Async Redis test passed!\n")
+
+def test_user_specific_limiting():
+    """Test that async buckets are kept per key"""
+    client = TestClient(app)
+
+    print("=== Testing Async User-Specific Rate Limiting (2/minute) ===")
+
+    for i in range(2):
+        response = client.get("/test-user", headers={"X-User-ID": "async_user_a"})
+        assert response.status_code == 200
+
+    response = client.get("/test-user", headers={"X-User-ID": "async_user_a"})
+    assert response.status_code == 429
+
+    response = client.get("/test-user", headers={"X-User-ID": "async_user_b"})
+    assert response.status_code == 200
+
+    print("✅ Async user-specific test passed!\n")
+
+def test_sync_endpoint_rejected():
+    """Test that async storage refuses to decorate a sync endpoint"""
+    with pytest.raises(TypeError):
+        @rate_limit("3/minute", storage_type="redis-async")
+        def sync_endpoint(request: Request):
+            return {"message": "Never registered"}
+
+def test_loop_clients_closed_at_shutdown():
+    """Test that the client opened for an event loop is closed when the loop shuts down"""
+    storage = AsyncRedisStorage(key_prefix="async_close_test:")
+
+    async def consume():
+        return await storage.atomic_consume_token("close_user", 2, 1, 60)
+
+    for i in range(2):
+        assert asyncio.run(consume())
+        assert len(storage._loop_clients) == 0
+
+def test_token_bucket_async_methods():
+    """Test that TokenBucket refuses sync calls on async storage and awaits the async ones"""
+    bucket = TokenBucket(1, 1, 60, AsyncRedisStorage(key_prefix="async_bucket_test:"))
+
+    with pytest.raises(TypeError):
+        bucket.allow_request("bucket_user")
+    with pytest.raises(TypeError):
+        bucket.get_bucket_info("bucket_user")
+
+    async def use_bucket():
+        return (
+            await bucket.allow_request_async("bucket_user"),
+            await bucket.allow_request_async("bucket_user"),
+            await bucket.get_bucket_info_async("bucket_user"),
+        )
+
+    first, second, info = asyncio.run(use_bucket())
+    assert first and not second
+    assert info['tokens'] == 0
+    assert info['last_refill'] is not None
@@ -0,0 +1,64 @@
+from src.rate_limiter.decorator import rate_limit
+from src.rate_limiter.storage.factory import StorageFactory
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import time
+
+
+app = FastAPI()
+
+@app.get("/test-basic")
+@rate_limit("3/minute", storage_type="reserving", key_func=lambda r: "reserving_basic_key")
+def basic_reserving(request: Request):
+    return {"message": "Success!"}
+
+def test_basic_functionality():
+    """Test that reserving tokens in chunks still admits only capacity requests"""
+    client = TestClient(app)
+
+    print("=== Testing Reserving Rate Limiting (3/minute) ===")
+
+    for i in range(3):
+        response = client.get("/test-basic")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    response = client.get("/test-basic")
+    print(f"Request 4: Status {response.status_code}")
+    assert response.status_code == 429
+    assert response.json()["detail"]["storage_type"] == "reserving"
+
+    print("✅ Reserving test passed!\n")
+
+def test_chunks_served_locally():
+    """Test that one Redis call reserves a chunk and the rest is served locally"""
+    storage = StorageFactory.create_storage("reserving", key_prefix="reserve_test:", chunk_size=4)
+
+    assert storage.atomic_consume_token("chunk_user", 10, 1, 3600)
+    tokens, _ = storage.get_bucket_state("chunk_user")
+    assert tokens == 6
+
+    for i in range(3):
+        assert storage.atomic_consume_token("chunk_user", 10, 1, 3600)
+    # Served from the reservation, Redis is untouched
+    tokens, _ = storage.get_bucket_state("chunk_user")
+    assert tokens == 6
+
+    print("✅ Local chunk test passed!\n")
+
+def test_expired_reservation_returned():
+    """Test that unused reserved tokens go back to the bucket once expired"""
+    storage = StorageFactory.create_storage(
+        "reserving", key_prefix="reserve_test:", chunk_size=2, reservation_ttl=0.05
+    )
+
+    # Reserves 2 of 3, 1 is left unused
+    assert storage.atomic_consume_token("return_user", 3, 1, 3600)
+    time.sleep(0.1)
+
+    # The unused token goes back, so 2 more requests are admitted, then no more
+    results = [storage.atomic_consume_token("return_user", 3, 1, 3600) for i in range(3)]
+    print(f"Requests after expiry: {results}")
+    assert results == [True, True, False]
+
+    print("✅ Expired reservation test passed!\n")
@@ -0,0 +1,63 @@
+from src.rate_limiter.decorator import rate_limit
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import time
+
+
+app = FastAPI()
+
+@app.get("/test-basic")
+@rate_limit("3/minute", storage_type="sliding_counter", key_func=lambda r: "sliding_basic_key")
+def basic_sliding_counter(request: Request):
+    return {"message": "Success!"}
+
+@app.get("/test-window")
+@rate_limit(2, 2, 1, storage_type="sliding_counter", key_func=lambda r: "sliding_window_key")
+def short_window(request: Request):
+    return {"message": "Short window"}
+
+def test_basic_functionality():
+    """Test that the sliding counter admits capacity requests per window"""
+    client = TestClient(app)
+
+    print("=== Testing Sliding Counter Rate Limiting (3/minute) ===")
+
+    for i in range(3):
+        response = client.get("/test-basic")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    response = client.get("/test-basic")
+    print(f"Request 4: Status {response.status_code}")
+    assert response.status_code == 429
+    assert response.json()["detail"]["storage_type"] == "sliding_counter"
+
+    print("✅ Sliding counter test passed!\n")
+
+def test_no_burst_at_window_boundary():
+    """Test that the previous window still counts right after a boundary"""
+    client = TestClient(app)
+
+    print("=== Testing Sliding Counter Across a Window Boundary (2 per second) ===")
+
+    # Start at the beginning of a window so both requests land in it
+    time.sleep(1 - time.time() % 1)
+
+    for i in range(2):
+        response = client.get("/test-window")
+        print(f"Request {i+1}: Status {response.status_code}")
+        assert response.status_code == 200
+
+    # A fixed window would admit requests again here
+    time.sleep(1 - time.time() % 1 + 0.05)
+    response = client.get("/test-window")
+    print(f"Just after the boundary: Status {response.status_code}")
+    assert response.status_code == 429
+
+    # Once over half the window has passed, the previous window weighs under one request
+    time.sleep(0.6)
+    response = client.get("/test-window")
+    print(f"Later in the window: Status {response.status_code}")
+    assert response.status_code == 200
+
+    print("✅ Sliding counter boundary test passed!\n")